@@ -1 +1,5 @@
-# 应用包初始化文件
\ No newline at end of file
+# 应用包初始化文件
+import time
+
+# 进程开始导入应用的时间，用于统计启动耗时
+IMPORT_STARTED_AT = time.perf_counter()
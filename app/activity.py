@@ -0,0 +1,109 @@
+"""
+用户活跃时间跟踪
+
+last_login_at / last_seen_at 先按用户ID缓存在内存中，由后台线程定期用一次
+批量 UPDATE 写回数据库，避免每次登录和每个认证请求都产生一次写操作。
+最大滞后时间由 ACTIVITY_FLUSH_INTERVAL 控制。
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, update
+
+from .database import engine
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# 活跃时间配置
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "30"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "10000"))
+
+_user_table = User.__table__
+
+# 参数为空时保留数据库中的原值
+_update_statement = (
+    update(_user_table)
+    .where(_user_table.c.id == bindparam("user_id"))
+    .values(
+        last_login_at=func.coalesce(bindparam("login_at"), _user_table.c.last_login_at),
+        last_seen_at=func.coalesce(bindparam("seen_at"), _user_table.c.last_seen_at),
+    )
+)
+
+class ActivityBuffer:
+    """按用户ID合并活跃时间，定期批量写回"""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch_login(self, user_id: int):
+        """记录一次登录"""
+        now = datetime.utcnow()
+        self._touch(user_id, login_at=now, seen_at=now)
+
+    def touch_seen(self, user_id: int):
+        """记录一次认证请求"""
+        self._touch(user_id, seen_at=datetime.utcnow())
+
+    def _touch(self, user_id: int, login_at: Optional[datetime] = None, seen_at: Optional[datetime] = None):
+        with self._lock:
+            entry = self._pending.setdefault(user_id, {"user_id": user_id, "login_at": None, "seen_at": None})
+            if login_at is not None:
+                entry["login_at"] = login_at
+            if seen_at is not None:
+                entry["seen_at"] = seen_at
+            pending = len(self._pending)
+        # 缓冲区过大时提前写回
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """立即写回缓冲区，返回更新的用户数"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.values()), {}
+            if not batch:
+                return 0
+            try:
+                with engine.begin() as conn:
+                    conn.execute(_update_statement, batch)
+            except Exception:
+                logger.exception("活跃时间写回失败，丢弃 %d 条记录", len(batch))
+                return 0
+            return len(batch)
+
+    def start(self):
+        """启动后台写回线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程并写回剩余记录"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+activity_buffer = ActivityBuffer(ACTIVITY_FLUSH_INTERVAL, ACTIVITY_MAX_PENDING)
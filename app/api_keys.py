@@ -0,0 +1,163 @@
+"""
+服务间调用的API密钥认证
+
+密钥只以 HMAC-SHA256 摘要保存，按摘要走唯一索引查询，不使用 bcrypt；
+校验结果缓存在内存中，命中缓存时每个请求只需一次 HMAC 计算。
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, FrozenSet, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Security, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+from sqlmodel import select
+
+from .database import get_read_session, LazySession
+from .models import ApiKey, User
+from .auth import SECRET_KEY, get_current_user, get_current_active_user, get_current_superuser
+
+# API密钥配置
+API_KEY_SECRET = os.getenv("API_KEY_SECRET", SECRET_KEY)
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# 无效密钥单独缓存，容量和时间都更小，避免随机密钥挤掉有效密钥
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "10"))
+API_KEY_NEGATIVE_CACHE_SIZE = int(os.getenv("API_KEY_NEGATIVE_CACHE_SIZE", "1000"))
+
+# 可授予的权限范围
+API_KEY_SCOPES = {"users:read", "audit:read"}
+
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+class ApiKeyPrincipal:
+    """通过API密钥认证的调用方"""
+
+    def __init__(self, key_id: int, user: User, scopes: FrozenSet[str]):
+        self.key_id = key_id
+        self.user = user
+        self.scopes = scopes
+
+class ApiKeyCache:
+    """摘要 -> 认证结果的 LRU 缓存，带过期时间"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[ApiKeyPrincipal]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Tuple[bool, Optional[ApiKeyPrincipal]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._entries[digest]
+                return False, None
+            self._entries.move_to_end(digest)
+            return True, entry[1]
+
+    def set(self, digest: str, principal: Optional[ApiKeyPrincipal]):
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, digest: str):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def invalidate_user(self, user_id: int):
+        """用户被禁用或删除时清除其密钥的缓存"""
+        with self._lock:
+            for digest in [d for d, (_, p) in self._entries.items() if p is not None and p.user.id == user_id]:
+                del self._entries[digest]
+
+api_key_cache = ApiKeyCache(API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL)
+invalid_api_key_cache = ApiKeyCache(API_KEY_NEGATIVE_CACHE_SIZE, API_KEY_NEGATIVE_CACHE_TTL)
+
+def hash_api_key(key: str) -> str:
+    """计算API密钥摘要"""
+    return hmac.new(API_KEY_SECRET.encode("utf-8"), key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def generate_api_key() -> Tuple[str, str]:
+    """生成API密钥，返回 (明文密钥, 前缀)"""
+    prefix = secrets.token_hex(4)
+    return f"ak_{prefix}_{secrets.token_urlsafe(32)}", prefix
+
+def verify_api_key(db: LazySession, key: str) -> Optional[ApiKeyPrincipal]:
+    """校验API密钥，优先使用缓存"""
+    digest = hash_api_key(key)
+    found, principal = api_key_cache.get(digest)
+    if found:
+        return principal
+    found, _ = invalid_api_key_cache.get(digest)
+    if found:
+        return None
+
+    principal = None
+    row = db.exec(
+        select(ApiKey, User)
+        .join(User, ApiKey.user_id == User.id)
+        .where(ApiKey.digest == digest)
+    ).first()
+    db.close()
+    if row is not None:
+        api_key, user = row
+        if api_key.is_active and user.is_active:
+            scopes = frozenset(scope for scope in api_key.scopes.split(",") if scope)
+            principal = ApiKeyPrincipal(api_key.id, user, scopes)
+
+    if principal is not None:
+        api_key_cache.set(digest, principal)
+    else:
+        invalid_api_key_cache.set(digest, None)
+    return principal
+
+def get_api_key_principal(
+    api_key: Optional[str] = Security(api_key_header),
+    db: LazySession = Depends(get_read_session)
+) -> ApiKeyPrincipal:
+    """通过 X-API-Key 请求头认证调用方"""
+    principal = verify_api_key(db, api_key) if api_key else None
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的API密钥",
+            headers={"WWW-Authenticate": "ApiKey"},
+        )
+    return principal
+
+def _check_scope(principal: ApiKeyPrincipal, scope: str) -> User:
+    if scope not in principal.scopes:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"API密钥缺少权限: {scope}"
+        )
+    return principal.user
+
+def require_superuser_or_scope(scope: str) -> Callable[..., User]:
+    """接受管理员的Bearer令牌，或带指定权限的API密钥"""
+    def dependency(
+        request: Request,
+        api_key: Optional[str] = Security(api_key_header),
+        token: Optional[str] = Depends(optional_oauth2_scheme),
+        db: LazySession = Depends(get_read_session)
+    ) -> User:
+        if api_key:
+            return _check_scope(get_api_key_principal(api_key, db), scope)
+        if not token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="未提供认证凭据",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return get_current_superuser(get_current_active_user(get_current_user(request, token, db)))
+    return dependency
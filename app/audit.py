@@ -0,0 +1,155 @@
+"""
+审计日志
+
+请求处理函数只把事件放入进程内的有界队列，由后台线程按批量大小或时间间隔
+批量写入 auditlog 表，登录等热路径上不会多出一次同步提交。
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request
+
+from .database import engine
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# 审计配置
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+class AuditWriter:
+    """审计事件的后台批量写入器"""
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._enqueued = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+        self._max_depth = 0
+
+    def record(
+        self,
+        event: str,
+        username: Optional[str] = None,
+        target_user_id: Optional[int] = None,
+        success: bool = True,
+        detail: Optional[str] = None,
+        client_ip: Optional[str] = None,
+    ) -> bool:
+        """记录一条审计事件，队列已满时丢弃并计数，不阻塞调用方"""
+        entry = {
+            "event": event,
+            "username": username,
+            "target_user_id": target_user_id,
+            "success": success,
+            "detail": detail,
+            "client_ip": client_ip,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._enqueued += 1
+            if depth > self._max_depth:
+                self._max_depth = depth
+        return True
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程，并写入队列中剩余的事件"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """返回队列与写入的统计信息"""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "max_queue_depth": self._max_depth,
+                "enqueued": self._enqueued,
+                "dropped": self._dropped,
+                "written": self._written,
+                "failed": self._failed,
+                "batches": self._batches,
+                "running": self._thread is not None and self._thread.is_alive(),
+            }
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        # 关闭前写完剩余事件
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(AuditLog.__table__.insert(), batch)
+        except Exception:
+            logger.exception("审计日志写入失败，丢弃 %d 条事件", len(batch))
+            with self._lock:
+                self._failed += len(batch)
+            return
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+
+audit_writer = AuditWriter(AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL)
+
+def client_ip(request: Request) -> Optional[str]:
+    """获取请求方IP"""
+    return request.client.host if request.client else None
+
+def record_event(event: str, **kwargs) -> bool:
+    """记录审计事件"""
+    return audit_writer.record(event, **kwargs)
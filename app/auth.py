@@ -1,14 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
-from .database import get_session
+from .database import get_read_session, LazySession, is_sticky
 from .models import User, TokenData
+from .activity import activity_buffer
 import os
-import bcrypt
+
+# bcrypt 和 jose 在首次使用时才导入，缩短 worker 启动时间
 
 # 安全配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -20,6 +20,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
+    import bcrypt
     try:
         return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
     except Exception:
@@ -27,6 +28,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
+    import bcrypt
     # bcrypt限制密码长度为72字节，自动截断
     password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
@@ -46,17 +48,9 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     statement = select(User).where(User.email == email)
     return db.exec(statement).first()
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """验证用户"""
-    user = get_user_by_username(db, username)
-    if not user:
-        return None
-    if not verify_password(password, user.hashed_password):
-        return None
-    return user
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -67,10 +61,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_read_session)
 ) -> User:
     """获取当前用户"""
+    from jose import JWTError, jwt
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -85,9 +81,14 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
+    # 刚写过数据的用户读主库，保证读到自己的写入
+    if is_sticky(token_data.username, request):
+        db.use_primary()
     user = get_user_by_username(db, username=token_data.username)
+    db.close()
     if user is None:
         raise credentials_exception
+    activity_buffer.touch_seen(user.id)
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -0,0 +1,65 @@
+"""
+列表接口的响应压缩
+
+根据 Accept-Encoding 协商 brotli（安装了 brotli 包时）或 gzip，
+响应体小于 COMPRESSION_MIN_SIZE 字节时不压缩。
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+# 压缩配置
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 编码 -> q 值"""
+    encodings = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[token.strip().lower()] = quality
+    return encodings
+
+def choose_encoding(request: Request) -> str:
+    """选择响应编码，不压缩时返回 identity"""
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return "identity"
+
+def compressed_json_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """序列化为 JSON，超过阈值时按协商结果压缩"""
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+
+    encoding = choose_encoding(request) if len(body) >= COMPRESSION_MIN_SIZE else "identity"
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+        headers["Content-Encoding"] = "br"
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
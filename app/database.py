@@ -1,5 +1,7 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import create_engine, Session
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -7,15 +9,103 @@ load_dotenv()
 
 # 数据库配置
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# 只读副本，未配置时读写都走主库
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# 写操作后该用户的读请求继续走主库的时间（秒）
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "5"))
 
 # 创建数据库引擎
 engine = create_engine(DATABASE_URL, echo=True)
+read_engine = create_engine(DATABASE_READ_URL, echo=True) if DATABASE_READ_URL else engine
 
-def create_db_and_tables():
-    """创建数据库和表"""
-    SQLModel.metadata.create_all(engine)
+# 写操作后返回给客户端的 Cookie，值为主库粘滞截止的 Unix 时间戳，
+# 请求落到其他 worker 时也能据此读主库
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+# 本进程内最近写过数据的用户 -> 主库粘滞截止时间（不保存 Cookie 的客户端）
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+_RECENT_WRITES_MAX = 10000
+
+class LazySession:
+    """按需创建的数据库会话
+
+    首次访问时才创建 Session 并从连接池取连接；close() 立即归还连接，
+    之后再次访问会重新创建会话。
+    """
+
+    def __init__(self, bind=engine):
+        self._bind = bind
+        self._session = None
+
+    def use_primary(self):
+        """改用主库（需在会话创建前调用）"""
+        if self._session is None:
+            self._bind = engine
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = Session(self._bind)
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def close(self):
+        """关闭会话并归还连接"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+def mark_write(key: str, response=None):
+    """记录一次写操作，之后一段时间内该用户的读请求走主库
+
+    传入 response 时同时设置 Cookie，使粘滞跨 worker 生效。
+    """
+    if read_engine is engine:
+        return
+    if response is not None:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(int(time.time() + READ_AFTER_WRITE_SECONDS) + 1),
+            max_age=int(READ_AFTER_WRITE_SECONDS) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+    now = time.monotonic()
+    with _recent_writes_lock:
+        if len(_recent_writes) >= _RECENT_WRITES_MAX:
+            for expired in [k for k, until in _recent_writes.items() if until <= now]:
+                del _recent_writes[expired]
+        _recent_writes[key] = now + READ_AFTER_WRITE_SECONDS
+
+def is_sticky(key: str, request=None) -> bool:
+    """该用户最近是否有写操作（检查请求中的 Cookie 和本进程记录）"""
+    if read_engine is engine:
+        return False
+    if request is not None:
+        try:
+            if float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time():
+                return True
+        except ValueError:
+            pass
+    with _recent_writes_lock:
+        until = _recent_writes.get(key)
+    return until is not None and until > time.monotonic()
 
 def get_session():
-    """获取数据库会话"""
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    """获取数据库会话（首次使用时才占用连接）"""
+    session = LazySession(engine)
+    try:
+        yield session
+    finally:
+        session.close()
+
+def get_read_session():
+    """获取只读数据库会话（配置了 DATABASE_READ_URL 时走只读副本）"""
+    session = LazySession(read_engine)
+    try:
+        yield session
+    finally:
+        session.close()
\ No newline at end of file
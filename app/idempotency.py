@@ -0,0 +1,216 @@
+"""
+Idempotency-Key 支持
+
+对注册和管理员更新用户等接口，带 Idempotency-Key 请求头的请求会记录响应：
+相同键的重试直接重放保存的响应，处理中的重复请求等待第一个请求的结果，
+不再重复 bcrypt 哈希和数据库事务。存储有容量上限和过期时间；5xx 响应不保存。
+存储在进程内，多 worker 时只对落到同一 worker 的重试生效。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Pattern, Tuple
+
+# 幂等配置
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+
+# 支持幂等键的路由
+IDEMPOTENT_ROUTES: List[Tuple[str, Pattern]] = [
+    ("POST", re.compile(r"^/auth/register/?$")),
+    ("PUT", re.compile(r"^/users/\d+/?$")),
+]
+
+class IdempotencyEntry:
+    """一个幂等键的处理状态和保存的响应"""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.status: Optional[int] = None
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.body = b""
+        self.expires_at = float("inf")
+
+class IdempotencyStore:
+    """有容量上限和过期时间的幂等键存储（进程内）"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, IdempotencyEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[IdempotencyEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def begin(self, key: str, fingerprint: str) -> IdempotencyEntry:
+        """登记一个处理中的请求"""
+        self._evict()
+        entry = IdempotencyEntry(fingerprint)
+        self._entries[key] = entry
+        return entry
+
+    def complete(self, key: str, entry: IdempotencyEntry):
+        """保存响应，之后的重试直接重放"""
+        entry.expires_at = time.monotonic() + self.ttl
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        entry.done.set_result(True)
+
+    def discard(self, key: str, entry: IdempotencyEntry):
+        """不保存响应（5xx 或异常），等待中的请求重新处理"""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set_result(False)
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+        # 处理中的请求不淘汰，否则重复请求会再次执行；全部处理中时允许暂时超出容量
+        for key in [k for k, e in self._entries.items() if e.done.done()]:
+            if len(self._entries) < self.maxsize:
+                break
+            del self._entries[key]
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL)
+
+class IdempotencyMiddleware:
+    """为指定路由提供 Idempotency-Key 支持"""
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_idempotent_route(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await self._send_json(send, 400, {"detail": "Idempotency-Key 过长"})
+            return
+
+        body = await self._read_body(receive)
+        caller = self._caller(scope, headers)
+        key = f"{scope['method']} {scope['path']} {caller} {idempotency_key.decode('latin-1')}"
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        while True:
+            entry = self.store.get(key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                await self._send_json(send, 422, {"detail": "Idempotency-Key 已用于不同的请求"})
+                return
+            try:
+                stored = await asyncio.wait_for(asyncio.shield(entry.done), IDEMPOTENCY_WAIT)
+            except asyncio.TimeoutError:
+                await self._send_json(send, 409, {"detail": "相同 Idempotency-Key 的请求正在处理"})
+                return
+            if stored:
+                await self._replay(send, entry)
+                return
+            # 第一个请求未保存结果，重新查找并自行处理
+
+        entry = self.store.begin(key, fingerprint)
+        try:
+            await self.app(scope, self._replay_receive(body, receive), self._capture_send(send, entry))
+        except BaseException:
+            self.store.discard(key, entry)
+            raise
+        if entry.status is not None and entry.status < 500:
+            self.store.complete(key, entry)
+        else:
+            self.store.discard(key, entry)
+
+    @staticmethod
+    def _caller(scope, headers: dict) -> str:
+        """按调用方区分幂等键：有认证信息时按认证信息，匿名请求按客户端地址"""
+        authorization = headers.get(b"authorization")
+        if authorization:
+            return "auth:" + hashlib.sha256(authorization).hexdigest()
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "")
+
+    @staticmethod
+    def _is_idempotent_route(method: str, path: str) -> bool:
+        return any(method == m and pattern.match(path) for m, pattern in IDEMPOTENT_ROUTES)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive):
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        return replay
+
+    @staticmethod
+    def _capture_send(send, entry: IdempotencyEntry):
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                entry.status = message["status"]
+                entry.headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    entry.body = b"".join(chunks)
+            await send(message)
+        return capture
+
+    @staticmethod
+    async def _replay(send, entry: IdempotencyEntry):
+        await send({
+            "type": "http.response.start",
+            "status": entry.status,
+            "headers": entry.headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": entry.body})
+
+    @staticmethod
+    async def _send_json(send, status_code: int, content: dict):
+        body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,17 +1,32 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import logging
+import time
 
-from .database import create_db_and_tables
-from .routes import auth, users
+from . import IMPORT_STARTED_AT
+from .migrations import check_schema_version
+from .scheduling import PrioritySchedulingMiddleware, scheduler
+from .idempotency import IdempotencyMiddleware
+from .audit import audit_writer
+from .activity import activity_buffer
+from .routes import auth, users, audit, api_keys
+
+logger = logging.getLogger("uvicorn.error")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    # 启动时创建数据库表
-    create_db_and_tables()
+    # 启动时只检查数据库结构版本，迁移由启动脚本执行
+    check_schema_version()
+    audit_writer.start()
+    activity_buffer.start()
+    app.state.startup_seconds = time.perf_counter() - IMPORT_STARTED_AT
+    logger.info("应用启动耗时 %.3f 秒", app.state.startup_seconds)
     yield
     # 关闭时的清理操作
+    activity_buffer.stop()
+    audit_writer.stop()
 
 app = FastAPI(
     title="用户管理系统API",
@@ -20,6 +35,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 优先级调度与过载保护（在 CORS 之内，503 响应也带 CORS 头）
+app.add_middleware(PrioritySchedulingMiddleware, scheduler=scheduler)
+
+# Idempotency-Key 支持（在调度之外，重放的响应不占用并发名额）
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS中间件配置
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +53,8 @@ app.add_middleware(
 # 注册路由
 app.include_router(auth.router)
 app.include_router(users.router)
+app.include_router(audit.router)
+app.include_router(api_keys.router)
 
 @app.get("/")
 def read_root():
@@ -39,6 +62,11 @@ def read_root():
     return {"message": "欢迎使用用户管理系统API"}
 
 @app.get("/health")
-def health_check():
-    """健康检查端点"""
-    return {"status": "healthy"}
\ No newline at end of file
+async def health_check():
+    """健康检查端点（异步执行，不占用线程池）"""
+    return {"status": "healthy", "startup_seconds": round(getattr(app.state, "startup_seconds", 0.0), 3)}
+
+@app.get("/health/scheduler")
+async def scheduler_stats():
+    """各优先级类别的并发与排队统计"""
+    return scheduler.stats()
\ No newline at end of file
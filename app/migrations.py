@@ -0,0 +1,145 @@
+"""
+数据库结构版本迁移
+
+由 run.py 在启动前执行一次（也可单独执行 python -m app.migrations），已执行的版本记录在
+schema_version 表中；各 worker 启动时只检查版本，不再反射和创建表。
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table,
+    func, inspect, select,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# 每个迁移使用自己冻结的表定义，不引用 models 中的模型，模型之后的修改不会改变已有迁移
+_version_table = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+def _add_columns(conn: Connection, table_name: str, *columns: Column):
+    """为已存在的表添加可空列（列已存在时跳过）"""
+    existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    for column in columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f'ALTER TABLE "{table_name}" ADD COLUMN "{column.name}" {column_type}')
+
+def _initial(conn: Connection):
+    user = Table(
+        "user", MetaData(),
+        Column("username", String, nullable=False),
+        Column("email", String, nullable=False),
+        Column("full_name", String),
+        Column("is_active", Boolean, nullable=False),
+        Column("is_superuser", Boolean, nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("hashed_password", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("updated_at", DateTime, nullable=False),
+        Index("ix_user_username", "username", unique=True),
+        Index("ix_user_email", "email", unique=True),
+    )
+    user.create(conn, checkfirst=True)
+
+def _user_activity(conn: Connection):
+    _add_columns(conn, "user", Column("last_login_at", DateTime), Column("last_seen_at", DateTime))
+
+def _audit_log(conn: Connection):
+    auditlog = Table(
+        "auditlog", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("event", String, nullable=False),
+        Column("username", String),
+        Column("target_user_id", Integer),
+        Column("success", Boolean, nullable=False),
+        Column("detail", String),
+        Column("client_ip", String),
+        Column("created_at", DateTime, nullable=False),
+        Index("ix_auditlog_event", "event"),
+        Index("ix_auditlog_username", "username"),
+        Index("ix_auditlog_created_at", "created_at"),
+    )
+    auditlog.create(conn, checkfirst=True)
+
+def _api_keys(conn: Connection):
+    metadata = MetaData()
+    # 仅用于解析外键
+    Table("user", metadata, Column("id", Integer, primary_key=True))
+    apikey = Table(
+        "apikey", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String, nullable=False),
+        Column("prefix", String, nullable=False),
+        Column("digest", String, nullable=False),
+        Column("scopes", String, nullable=False),
+        Column("user_id", Integer, ForeignKey("user.id"), nullable=False),
+        Column("is_active", Boolean, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("revoked_at", DateTime),
+        Index("ix_apikey_prefix", "prefix"),
+        Index("ix_apikey_digest", "digest", unique=True),
+        Index("ix_apikey_user_id", "user_id"),
+    )
+    apikey.create(conn, checkfirst=True)
+
+# (版本号, 名称, 迁移函数)，只追加不修改
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial", _initial),
+    (2, "user_activity", _user_activity),
+    (3, "audit_log", _audit_log),
+    (4, "api_keys", _api_keys),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(bind: Engine = engine) -> int:
+    """当前数据库结构版本，未初始化时为 0"""
+    with bind.connect() as conn:
+        if not inspect(conn).has_table(_version_table.name):
+            return 0
+        version = conn.execute(select(func.max(_version_table.c.version))).scalar()
+    return version or 0
+
+def run_migrations(bind: Engine = engine) -> List[int]:
+    """执行未应用的迁移，返回本次执行的版本号"""
+    with bind.begin() as conn:
+        _version_table.create(conn, checkfirst=True)
+
+    current = get_schema_version(bind)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with bind.begin() as conn:
+            migrate(conn)
+            conn.execute(_version_table.insert().values(version=version, name=name))
+        logger.info("已应用迁移 %d_%s", version, name)
+        applied.append(version)
+    return applied
+
+def check_schema_version(bind: Engine = engine):
+    """检查数据库结构是否为最新版本"""
+    current = get_schema_version(bind)
+    if current < LATEST_VERSION:
+        raise RuntimeError(
+            f"数据库结构版本为 {current}，需要 {LATEST_VERSION}，请先执行 python -m app.migrations"
+        )
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    applied = run_migrations()
+    if applied:
+        print(f"数据库已迁移到版本 {LATEST_VERSION}（本次执行: {', '.join(map(str, applied))}）")
+    else:
+        print(f"数据库已是最新版本 {LATEST_VERSION}")
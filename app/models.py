@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from pydantic import validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -16,6 +17,8 @@ class User(UserBase, table=True):
     hashed_password: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    last_login_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
 
 class UserCreate(SQLModel):
     """用户创建模型"""
@@ -29,6 +32,21 @@ class UserRead(UserBase):
     id: int
     created_at: datetime
     updated_at: datetime
+    last_login_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
+
+class UserReadPartial(SQLModel):
+    """用户列表读取模型（指定 fields 时只包含所选字段）"""
+    username: Optional[str] = None
+    email: Optional[str] = None
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    last_login_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
 
 class UserUpdate(SQLModel):
     """用户更新模型"""
@@ -38,6 +56,66 @@ class UserUpdate(SQLModel):
     password: Optional[str] = None
     is_active: Optional[bool] = None
 
+class AuditLog(SQLModel, table=True):
+    """审计日志数据库模型"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    event: str = Field(index=True)
+    username: Optional[str] = Field(default=None, index=True)
+    target_user_id: Optional[int] = None
+    success: bool = True
+    detail: Optional[str] = None
+    client_ip: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class AuditLogRead(SQLModel):
+    """审计日志读取模型"""
+    id: int
+    event: str
+    username: Optional[str]
+    target_user_id: Optional[int]
+    success: bool
+    detail: Optional[str]
+    client_ip: Optional[str]
+    created_at: datetime
+
+class ApiKey(SQLModel, table=True):
+    """API密钥数据库模型（只保存密钥摘要）"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    prefix: str = Field(index=True)
+    digest: str = Field(unique=True, index=True)
+    scopes: str = ""
+    user_id: int = Field(foreign_key="user.id", index=True)
+    is_active: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    revoked_at: Optional[datetime] = None
+
+class ApiKeyCreate(SQLModel):
+    """API密钥创建模型"""
+    name: str
+    scopes: List[str] = []
+
+class ApiKeyRead(SQLModel):
+    """API密钥读取模型"""
+    id: int
+    name: str
+    prefix: str
+    scopes: List[str]
+    user_id: int
+    is_active: bool
+    created_at: datetime
+    revoked_at: Optional[datetime]
+
+    @validator("scopes", pre=True)
+    def split_scopes(cls, value):
+        if isinstance(value, str):
+            return [scope for scope in value.split(",") if scope]
+        return value
+
+class ApiKeyCreated(ApiKeyRead):
+    """API密钥创建响应模型（明文密钥只返回这一次）"""
+    key: str
+
 class Token(SQLModel):
     """Token响应模型"""
     access_token: str
@@ -1,3 +1,5 @@
 # 路由包初始化文件
 from .auth import router as auth_router
-from .users import router as users_router
\ No newline at end of file
+from .users import router as users_router
+from .audit import router as audit_router
+from .api_keys import router as api_keys_router
\ No newline at end of file
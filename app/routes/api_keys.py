@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel import select
+from datetime import datetime
+from typing import List
+
+from ..database import get_session, get_read_session, LazySession, mark_write
+from ..models import User, ApiKey, ApiKeyCreate, ApiKeyRead, ApiKeyCreated
+from ..auth import get_current_superuser
+from ..audit import record_event
+from ..api_keys import API_KEY_SCOPES, api_key_cache, generate_api_key, hash_api_key
+from ..compression import compressed_json_response
+
+router = APIRouter(prefix="/api-keys", tags=["API密钥"])
+
+@router.post("/", response_model=ApiKeyCreated)
+def create_api_key(
+    api_key_create: ApiKeyCreate,
+    response: Response,
+    current_user: User = Depends(get_current_superuser),
+    db: LazySession = Depends(get_session)
+):
+    """创建API密钥（仅管理员），明文密钥只在响应中返回一次"""
+    unknown_scopes = set(api_key_create.scopes) - API_KEY_SCOPES
+    if unknown_scopes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"未知的权限: {','.join(sorted(unknown_scopes))}"
+        )
+
+    key, prefix = generate_api_key()
+    api_key = ApiKey(
+        name=api_key_create.name,
+        prefix=prefix,
+        digest=hash_api_key(key),
+        scopes=",".join(sorted(set(api_key_create.scopes))),
+        user_id=current_user.id
+    )
+
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    db.close()
+    mark_write(current_user.username, response)
+
+    record_event("api_key_create", username=current_user.username, detail=f"{api_key.id}:{api_key.name}")
+    return ApiKeyCreated(**ApiKeyRead.from_orm(api_key).dict(), key=key)
+
+@router.get("/", response_model=List[ApiKeyRead])
+def read_api_keys(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_superuser),
+    db: LazySession = Depends(get_read_session)
+):
+    """获取API密钥列表（仅管理员）"""
+    statement = select(ApiKey).offset(skip).limit(limit)
+    api_keys = db.exec(statement).all()
+    db.close()
+    return compressed_json_response(request, [ApiKeyRead.from_orm(api_key) for api_key in api_keys])
+
+@router.delete("/{key_id}")
+def revoke_api_key(
+    key_id: int,
+    response: Response,
+    current_user: User = Depends(get_current_superuser),
+    db: LazySession = Depends(get_session)
+):
+    """吊销API密钥（仅管理员）"""
+    api_key = db.get(ApiKey, key_id)
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API密钥不存在"
+        )
+
+    digest = api_key.digest
+    api_key.is_active = False
+    api_key.revoked_at = datetime.utcnow()
+    db.add(api_key)
+    db.commit()
+    db.close()
+    mark_write(current_user.username, response)
+
+    api_key_cache.invalidate(digest)
+    record_event("api_key_revoke", username=current_user.username, detail=str(key_id))
+    return {"message": "API密钥已吊销"}
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Request
+from sqlmodel import select
+from typing import List, Optional
+
+from ..database import get_read_session, LazySession
+from ..models import User, AuditLog, AuditLogRead
+from ..auth import get_current_superuser
+from ..audit import audit_writer
+from ..api_keys import require_superuser_or_scope
+from ..compression import compressed_json_response
+
+router = APIRouter(prefix="/audit", tags=["审计"])
+
+@router.get("/", response_model=List[AuditLogRead])
+def read_audit_logs(
+    request: Request,
+    event: Optional[str] = None,
+    username: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(require_superuser_or_scope("audit:read")),
+    db: LazySession = Depends(get_read_session)
+):
+    """查询审计日志（仅管理员）"""
+    statement = select(AuditLog)
+    if event:
+        statement = statement.where(AuditLog.event == event)
+    if username:
+        statement = statement.where(AuditLog.username == username)
+    statement = statement.order_by(AuditLog.id.desc()).offset(skip).limit(limit)
+    logs = db.exec(statement).all()
+    db.close()
+    return compressed_json_response(request, [AuditLogRead.from_orm(log) for log in logs])
+
+@router.get("/stats")
+def read_audit_stats(current_user: User = Depends(get_current_superuser)):
+    """审计队列统计（仅管理员）"""
+    return audit_writer.stats()
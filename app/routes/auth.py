@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
 from datetime import timedelta
 
-from ..database import get_session
+from ..database import get_session, LazySession, mark_write
+from ..audit import record_event, client_ip
+from ..activity import activity_buffer
+from ..api_keys import api_key_cache
 from ..models import User, UserCreate, UserRead, Token
 from ..auth import (
-    get_password_hash, authenticate_user, create_access_token,
+    get_password_hash, verify_password, create_access_token,
     get_user_by_username, get_user_by_email, get_current_active_user
 )
 
 router = APIRouter(prefix="/auth", tags=["认证"])
 
 @router.post("/register", response_model=UserRead)
-def register(user: UserCreate, db: Session = Depends(get_session)):
+def register(
+    user: UserCreate,
+    request: Request,
+    response: Response,
+    db: LazySession = Depends(get_session)
+):
     """用户注册"""
     # 检查用户名是否已存在
     db_user = get_user_by_username(db, username=user.username)
@@ -31,6 +39,9 @@ def register(user: UserCreate, db: Session = Depends(get_session)):
             detail="邮箱已存在"
         )
 
+    # 密码哈希耗时较长，先归还连接
+    db.close()
+
     # 创建新用户
     try:
         hashed_password = get_password_hash(user.password)
@@ -50,17 +61,26 @@ def register(user: UserCreate, db: Session = Depends(get_session)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    db.close()
+    mark_write(db_user.username, response)
 
+    record_event("register", username=db_user.username, target_user_id=db_user.id,
+                 client_ip=client_ip(request))
     return db_user
 
 @router.post("/login", response_model=Token)
 def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_session)
 ):
     """用户登录"""
-    user = authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+    user = get_user_by_username(db, form_data.username)
+    # 密码校验耗时较长，先归还连接
+    db.close()
+    if not user or not verify_password(form_data.password, user.hashed_password):
+        record_event("login", username=form_data.username, success=False,
+                     detail="用户名或密码错误", client_ip=client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -68,11 +88,16 @@ def login(
         )
 
     if not user.is_active:
+        record_event("login", username=user.username, target_user_id=user.id, success=False,
+                     detail="用户已被禁用", client_ip=client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户已被禁用"
         )
 
+    record_event("login", username=user.username, target_user_id=user.id,
+                 client_ip=client_ip(request))
+    activity_buffer.touch_login(user.id)
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -88,8 +113,9 @@ def read_users_me(current_user: User = Depends(get_current_active_user)):
 @router.put("/me", response_model=UserRead)
 def update_user_me(
     user_update: dict,
+    response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_session)
 ):
     """更新当前用户信息"""
     # 检查用户名是否与其他用户冲突
@@ -110,6 +136,8 @@ def update_user_me(
                 detail="邮箱已存在"
             )
 
+    db.close()
+
     # 更新字段
     for field, value in user_update.items():
         if hasattr(current_user, field):
@@ -122,5 +150,12 @@ def update_user_me(
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
+    db.close()
+    mark_write(current_user.username, response)
+    if 'is_active' in user_update:
+        api_key_cache.invalidate_user(current_user.id)
+
+    record_event("profile_update", username=current_user.username, target_user_id=current_user.id,
+                 detail=",".join(sorted(user_update)))
 
     return current_user
\ No newline at end of file
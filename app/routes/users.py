@@ -1,33 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import Session, select
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlmodel import select
+from sqlalchemy import delete
+from typing import List, Optional
 
-from ..database import get_session
-from ..models import User, UserRead, UserUpdate
+from ..database import get_session, get_read_session, LazySession, mark_write
+from ..models import User, UserRead, UserReadPartial, UserUpdate, ApiKey
 from ..auth import get_current_superuser, get_user_by_username, get_user_by_email, get_password_hash
+from ..audit import record_event
+from ..api_keys import api_key_cache, require_superuser_or_scope
+from ..compression import compressed_json_response
 
 router = APIRouter(prefix="/users", tags=["用户管理"])
 
-@router.get("/", response_model=List[UserRead])
+# 列表接口可选择的字段
+USER_READ_FIELDS = list(UserRead.__fields__)
+
+@router.get(
+    "/",
+    response_model=List[UserReadPartial],
+    response_description="用户列表；指定 fields 时每个对象只包含所选字段，否则包含全部字段",
+)
 def read_users(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_superuser),
-    db: Session = Depends(get_session)
+    fields: Optional[str] = Query(
+        None,
+        description=f"逗号分隔的返回字段，例如 id,username；可选字段: {','.join(USER_READ_FIELDS)}"
+    ),
+    current_user: User = Depends(require_superuser_or_scope("users:read")),
+    db: LazySession = Depends(get_read_session)
 ):
-    """获取用户列表（仅管理员）"""
-    statement = select(User).offset(skip).limit(limit)
-    users = db.exec(statement).all()
-    return users
+    """获取用户列表（仅管理员），只查询并返回 fields 指定的字段"""
+    if fields is not None:
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        if not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"fields 不能为空，可选字段: {','.join(USER_READ_FIELDS)}"
+            )
+        unknown = [field for field in selected if field not in USER_READ_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"未知的字段: {','.join(unknown)}，可选字段: {','.join(USER_READ_FIELDS)}"
+            )
+    else:
+        selected = USER_READ_FIELDS
+
+    statement = select(*[getattr(User, field) for field in selected]).order_by(User.id).offset(skip).limit(limit)
+    rows = db.execute(statement).mappings().all()
+    db.close()
+    return compressed_json_response(request, [dict(row) for row in rows])
 
 @router.get("/{user_id}", response_model=UserRead)
 def read_user(
     user_id: int,
-    current_user: User = Depends(get_current_superuser),
-    db: Session = Depends(get_session)
+    current_user: User = Depends(require_superuser_or_scope("users:read")),
+    db: LazySession = Depends(get_read_session)
 ):
     """获取指定用户（仅管理员）"""
     user = db.get(User, user_id)
+    db.close()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,9 +72,10 @@ def read_user(
 @router.put("/{user_id}", response_model=UserRead)
 def update_user(
     user_id: int,
+    response: Response,
     user_update: UserUpdate,
     current_user: User = Depends(get_current_superuser),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_session)
 ):
     """更新指定用户（仅管理员）"""
     user = db.get(User, user_id)
@@ -68,6 +103,8 @@ def update_user(
                 detail="邮箱已存在"
             )
 
+    db.close()
+
     # 更新字段
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
@@ -80,14 +117,21 @@ def update_user(
     db.add(user)
     db.commit()
     db.refresh(user)
+    db.close()
+    mark_write(current_user.username, response)
+    if 'is_active' in update_data:
+        api_key_cache.invalidate_user(user_id)
 
+    record_event("user_update", username=current_user.username, target_user_id=user_id,
+                 detail=",".join(sorted(update_data)))
     return user
 
 @router.delete("/{user_id}")
 def delete_user(
     user_id: int,
+    response: Response,
     current_user: User = Depends(get_current_superuser),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_session)
 ):
     """删除指定用户（仅管理员）"""
     user = db.get(User, user_id)
@@ -104,16 +148,23 @@ def delete_user(
             detail="不能删除自己的账户"
         )
 
+    db.execute(delete(ApiKey).where(ApiKey.user_id == user_id))
     db.delete(user)
     db.commit()
+    db.close()
+    mark_write(current_user.username, response)
+    api_key_cache.invalidate_user(user_id)
+
+    record_event("user_delete", username=current_user.username, target_user_id=user_id)
 
     return {"message": "用户删除成功"}
 
 @router.post("/{user_id}/toggle-active")
 def toggle_user_active(
     user_id: int,
+    response: Response,
     current_user: User = Depends(get_current_superuser),
-    db: Session = Depends(get_session)
+    db: LazySession = Depends(get_session)
 ):
     """启用/禁用用户（仅管理员）"""
     user = db.get(User, user_id)
@@ -130,10 +181,16 @@ def toggle_user_active(
             detail="不能禁用自己的账户"
         )
 
-    user.is_active = not user.is_active
+    is_active = not user.is_active
+    user.is_active = is_active
     user.updated_at = user.updated_at.now()
     db.add(user)
     db.commit()
+    db.close()
+    mark_write(current_user.username, response)
+    api_key_cache.invalidate_user(user_id)
 
-    status_text = "启用" if user.is_active else "禁用"
+    status_text = "启用" if is_active else "禁用"
+    record_event("user_toggle_active", username=current_user.username, target_user_id=user_id,
+                 detail=status_text)
     return {"message": f"用户已{status_text}"}
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+按优先级分类的请求调度与过载保护
+
+每个请求按路由分到一个优先级类别，各类别有独立的并发上限、排队长度和排队超时。
+排队已满或超时未获得执行机会的请求直接返回 503 和 Retry-After，避免注册/登录
+的 bcrypt 计算挤占线程池，使令牌读取和 /health 失去响应。
+"""
+import asyncio
+import json
+import math
+import os
+import re
+from collections import deque
+from typing import Deque, Dict, List, Pattern, Tuple
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+class PriorityClass:
+    """一个优先级类别：先进先出排队，超过并发上限的请求等待至多 deadline 秒"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, deadline: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.served = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @classmethod
+    def from_env(cls, name: str, limit: int, queue_size: int, deadline: float) -> "PriorityClass":
+        """从环境变量 SCHED_<NAME>_LIMIT / _QUEUE / _DEADLINE 读取配置"""
+        prefix = f"SCHED_{name.upper()}"
+        return cls(
+            name,
+            _env_int(f"{prefix}_LIMIT", limit),
+            _env_int(f"{prefix}_QUEUE", queue_size),
+            _env_float(f"{prefix}_DEADLINE", deadline),
+        )
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """获取执行机会，排队已满或超时返回 False"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_waiting = max(self.max_waiting, len(self._waiters))
+        try:
+            # release() 把执行机会直接转交给等待者，in_flight 不变
+            await asyncio.wait_for(waiter, self.deadline)
+            return True
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        except BaseException:
+            # 客户端断开等导致的取消：已转交的执行机会要归还
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        """释放执行机会，优先转交给排队中的请求"""
+        self.served += 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_waiting,
+            "deadline_seconds": self.deadline,
+            "served": self.served,
+            "shed": self.shed,
+        }
+
+class Scheduler:
+    """按方法和路径把请求分到优先级类别"""
+
+    # 需要（或可能需要，修改密码时）计算 bcrypt 的路由
+    HASHING_ROUTES: List[Tuple[str, Pattern]] = [
+        ("POST", re.compile(r"^/auth/register/?$")),
+        ("POST", re.compile(r"^/auth/login/?$")),
+        ("PUT", re.compile(r"^/auth/me/?$")),
+        ("PUT", re.compile(r"^/users/\d+/?$")),
+    ]
+
+    def __init__(self):
+        self.classes: Dict[str, PriorityClass] = {
+            "health": PriorityClass.from_env("health", 64, 256, 1.0),
+            "read": PriorityClass.from_env("read", 16, 64, 2.0),
+            "write": PriorityClass.from_env("write", 8, 32, 5.0),
+            "hashing": PriorityClass.from_env("hashing", 8, 16, 3.0),
+        }
+
+    def classify(self, method: str, path: str) -> PriorityClass:
+        if path == "/" or path == "/health" or path.startswith("/health/"):
+            return self.classes["health"]
+        if any(method == m and pattern.match(path) for m, pattern in self.HASHING_ROUTES):
+            return self.classes["hashing"]
+        if method in ("GET", "HEAD", "OPTIONS"):
+            return self.classes["read"]
+        return self.classes["write"]
+
+    def stats(self) -> dict:
+        return {name: priority.stats() for name, priority in self.classes.items()}
+
+scheduler = Scheduler()
+
+class PrioritySchedulingMiddleware:
+    """按优先级类别限制并发，无法及时处理的请求返回 503"""
+
+    def __init__(self, app, scheduler: Scheduler = scheduler):
+        self.app = app
+        self.scheduler = scheduler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.scheduler.classify(scope["method"], scope["path"])
+        if not await priority.acquire():
+            await self._reject(send, priority)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            priority.release()
+
+    @staticmethod
+    async def _reject(send, priority: PriorityClass):
+        body = json.dumps({"detail": "服务繁忙，请稍后重试"}, ensure_ascii=False).encode("utf-8")
+        retry_after = max(1, math.ceil(priority.deadline))
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,9 +3,11 @@
 FastAPI服务器启动脚本
 """
 import uvicorn
-from app.main import app
+from app.migrations import run_migrations
 
 if __name__ == "__main__":
+    # 启动前执行一次数据库迁移，worker 启动时只检查版本
+    run_migrations()
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
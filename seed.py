@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+性能测试数据生成脚本
+
+直接通过 app.database.engine 批量插入 User 数据：大事务 + executemany，
+所有用户共用一个预先计算好的密码哈希，不受 bcrypt 速度限制。
+每行的随机数由种子和序号决定，同一序号的用户总是相同，分批追加（--start）与一次生成的数据一致。
+
+示例：
+    python seed.py --count 1000000 --credentials 100
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.database import engine
+from app.models import User
+from app.migrations import run_migrations
+from app.auth import get_password_hash
+
+FIRST_NAMES = ["Wei", "Fang", "Min", "Jing", "Lei", "Yan", "Tao", "Hui", "Jun", "Xin",
+               "Alex", "Sam", "Chris", "Jordan", "Taylor", "Morgan", "Casey", "Riley"]
+LAST_NAMES = ["Wang", "Li", "Zhang", "Liu", "Chen", "Yang", "Zhao", "Huang", "Zhou", "Wu",
+              "Smith", "Brown", "Lee", "Garcia", "Miller", "Davis", "Wilson", "Moore"]
+DOMAINS = ["example.com", "example.org", "example.net", "test.local"]
+# 创建时间从该时间点往前随机取，不依赖运行时刻
+CREATED_BEFORE = datetime(2025, 1, 1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量生成性能测试用户数据")
+    parser.add_argument("--count", type=int, default=100000, help="生成的用户数量")
+    parser.add_argument("--start", type=int, default=0, help="起始序号（追加数据时避免用户名冲突）")
+    parser.add_argument("--prefix", default="seed", help="用户名前缀")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--batch-size", type=int, default=10000, help="每次 executemany 的行数")
+    parser.add_argument("--transaction-size", type=int, default=200000, help="每个事务的行数")
+    parser.add_argument("--password", default="seedpassword123", help="所有生成用户的密码")
+    parser.add_argument("--inactive-ratio", type=float, default=0.05, help="禁用用户比例")
+    parser.add_argument("--superuser-ratio", type=float, default=0.001, help="管理员比例")
+    parser.add_argument("--credentials", type=int, default=0, help="输出前 N 个可登录用户的凭据")
+    parser.add_argument("--credentials-file", default="seed_credentials.json", help="凭据输出文件")
+    return parser.parse_args()
+
+def generate_users(args, hashed_password: str):
+    """按序号确定性地生成用户数据：每行的随机数只取决于种子和序号，与 --start 无关"""
+    rng = random.Random()
+    for index in range(args.start, args.start + args.count):
+        rng.seed(f"{args.seed}:{index}")
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        username = f"{args.prefix}_{first.lower()}{last.lower()}_{index:08d}"
+        created_at = CREATED_BEFORE - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        domain = rng.choice(DOMAINS)
+        # 随机数总是全部抽取，生成的数据只取决于种子
+        is_active = rng.random() >= args.inactive_ratio
+        is_superuser = rng.random() < args.superuser_ratio
+        # 凭据用户必须可登录
+        if index - args.start < args.credentials:
+            is_active, is_superuser = True, False
+        yield {
+            "username": username,
+            "email": f"{username}@{domain}",
+            "full_name": f"{first} {last}",
+            "is_active": is_active,
+            "is_superuser": is_superuser,
+            "hashed_password": hashed_password,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+def seed(args):
+    run_migrations()
+    # 批量插入时不输出每条 SQL
+    engine.echo = False
+
+    hashed_password = get_password_hash(args.password)
+    insert = User.__table__.insert()
+    credentials = []
+    inserted = 0
+    started = time.perf_counter()
+
+    rows = generate_users(args, hashed_password)
+    while inserted < args.count:
+        with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            in_transaction = 0
+            while in_transaction < args.transaction_size and inserted < args.count:
+                size = min(args.batch_size, args.transaction_size - in_transaction, args.count - inserted)
+                batch = [next(rows) for _ in range(size)]
+                conn.execute(insert, batch)
+                for row in batch:
+                    if len(credentials) < args.credentials:
+                        credentials.append({"username": row["username"], "password": args.password})
+                in_transaction += size
+                inserted += size
+        elapsed = time.perf_counter() - started
+        print(f"已插入 {inserted}/{args.count} 个用户，{inserted / elapsed:.0f} 行/秒")
+
+    if credentials:
+        with open(args.credentials_file, "w", encoding="utf-8") as f:
+            json.dump(credentials, f, ensure_ascii=False, indent=2)
+        print(f"已写入 {len(credentials)} 组登录凭据到 {args.credentials_file}")
+
+if __name__ == "__main__":
+    seed(parse_args())
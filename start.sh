@@ -5,11 +5,7 @@ echo "启动 FastAPI 用户管理系统..."
 # 激活虚拟环境
 source .venv/bin/activate
 
-# 创建数据库表
-echo "初始化数据库..."
-python -c "from app.database import create_db_and_tables; create_db_and_tables()"
-
-# 启动服务器
+# 启动服务器（run.py 会先执行数据库迁移）
 echo "启动服务器..."
 python run.py &
 SERVER_PID=$!
@@ -3,10 +3,16 @@
 详细的API功能测试脚本
 """
 import requests
+import asyncio
 import json
+import threading
 import time
 import sys
 
+from app import idempotency
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.scheduling import PriorityClass, PrioritySchedulingMiddleware, Scheduler
+
 BASE_URL = "http://localhost:8000"
 
 def print_test_header(test_name):
@@ -256,6 +262,297 @@ def test_admin_endpoints(tokens):
 
     return False
 
+async def call_asgi(app, method, path, headers=(), body=b""):
+    """在进程内调用 ASGI 应用，返回 (状态码, 响应头, 响应体)"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 50000),
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # 请求体已读完，模拟连接保持直到处理结束
+        await asyncio.Event().wait()
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    response_body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], dict(start.get("headers", [])), response_body
+
+def make_stub_app(calls, status_code=200, delay=0.0):
+    """记录调用次数的 ASGI 应用，可指定状态码和处理耗时"""
+    async def stub(scope, receive, send):
+        calls.append(scope["path"])
+        await receive()
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": status_code, "headers": []})
+        await send({"type": "http.response.body", "body": b'{"ok": true}'})
+    return stub
+
+def test_idempotency():
+    """测试 Idempotency-Key 支持"""
+    print_test_header("幂等键测试")
+
+    all_passed = True
+    suffix = str(int(time.time() * 1000))
+    user_data = {
+        "username": f"idem_{suffix}",
+        "email": f"idem_{suffix}@example.com",
+        "password": "idempotent123",
+    }
+
+    # 并发的相同请求只执行一次，其余等待并重放
+    try:
+        print("\n子测试: 并发重复注册只执行一次")
+        headers = {"Idempotency-Key": f"register-{suffix}"}
+        responses = [None] * 3
+
+        def register(index):
+            responses[index] = requests.post(f"{BASE_URL}/auth/register", json=user_data, headers=headers)
+
+        threads = [threading.Thread(target=register, args=(i,)) for i in range(len(responses))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(f"  状态码: {[r.status_code for r in responses]}")
+        assert all(r.status_code == 200 for r in responses), "重复请求应该全部成功"
+        assert len({r.json()["id"] for r in responses}) == 1, "重复请求创建了多个用户"
+        replayed = [r.headers.get("Idempotent-Replayed") for r in responses]
+        print(f"  Idempotent-Replayed: {replayed}")
+        assert replayed.count("true") == len(responses) - 1, "应该只有第一个请求真正执行"
+
+        response = requests.post(f"{BASE_URL}/auth/register", json=user_data, headers=headers)
+        print(f"  重试状态码: {response.status_code}")
+        assert response.status_code == 200, "重试应该重放第一次的响应"
+        assert response.headers.get("Idempotent-Replayed") == "true", "重试响应缺少 Idempotent-Replayed"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    # 相同键、不同请求体
+    try:
+        print("\n子测试: 相同键用于不同请求体")
+        other = dict(user_data, email=f"idem_other_{suffix}@example.com")
+        response = requests.post(f"{BASE_URL}/auth/register", json=other, headers=headers)
+        print(f"  状态码: {response.status_code}")
+        assert response.status_code == 422, "应该返回422"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    # 以下在进程内直接调用中间件，不依赖服务器状态
+    path = "/auth/register"
+    key_headers = [("Idempotency-Key", "stub-key")]
+
+    try:
+        print("\n子测试: 等待超时返回409")
+
+        async def wait_timeout():
+            calls = []
+            middleware = IdempotencyMiddleware(make_stub_app(calls, delay=0.5), IdempotencyStore(100, 60))
+            first = asyncio.create_task(call_asgi(middleware, "POST", path, key_headers, b"{}"))
+            await asyncio.sleep(0.05)
+            second = await call_asgi(middleware, "POST", path, key_headers, b"{}")
+            return (await first)[0], second[0], len(calls)
+
+        wait = idempotency.IDEMPOTENCY_WAIT
+        idempotency.IDEMPOTENCY_WAIT = 0.1
+        try:
+            first_status, second_status, executed = asyncio.run(wait_timeout())
+        finally:
+            idempotency.IDEMPOTENCY_WAIT = wait
+        print(f"  状态码: {first_status}, {second_status}，执行次数: {executed}")
+        assert (first_status, second_status) == (200, 409), "等待超时应该返回409"
+        assert executed == 1, "等待超时的请求不应该执行"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    try:
+        print("\n子测试: 5xx 响应不保存")
+
+        async def server_error():
+            calls = []
+            middleware = IdempotencyMiddleware(make_stub_app(calls, status_code=500), IdempotencyStore(100, 60))
+            first = await call_asgi(middleware, "POST", path, key_headers, b"{}")
+            second = await call_asgi(middleware, "POST", path, key_headers, b"{}")
+            return first, second, len(calls)
+
+        first, second, executed = asyncio.run(server_error())
+        print(f"  状态码: {first[0]}, {second[0]}，执行次数: {executed}")
+        assert executed == 2, "5xx 响应不应该被重放"
+        assert b"idempotent-replayed" not in second[1], "5xx 响应不应该被重放"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    return all_passed
+
+def test_scheduling():
+    """测试优先级调度与过载保护（进程内调用，不依赖服务器配置）"""
+    print_test_header("优先级调度测试")
+
+    all_passed = True
+
+    try:
+        print("\n子测试: 路由分类")
+        scheduler = Scheduler()
+        cases = [
+            ("GET", "/health", "health"),
+            ("GET", "/health/scheduler", "health"),
+            ("GET", "/", "health"),
+            ("POST", "/auth/register", "hashing"),
+            ("POST", "/auth/login", "hashing"),
+            ("PUT", "/auth/me", "hashing"),
+            ("PUT", "/users/5", "hashing"),
+            ("GET", "/users/5", "read"),
+            ("GET", "/auth/me", "read"),
+            ("DELETE", "/users/5", "write"),
+            ("POST", "/users/5/toggle-active", "write"),
+        ]
+        for method, path, expected in cases:
+            actual = scheduler.classify(method, path).name
+            assert actual == expected, f"{method} {path} 应该属于 {expected}，实际为 {actual}"
+        print(f"  {len(cases)} 条路由分类正确")
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    try:
+        print("\n子测试: 释放的执行机会按先进先出转交")
+
+        async def fifo_handoff():
+            priority = PriorityClass("test", 1, 8, 1.0)
+            assert await priority.acquire(), "空闲时应该立即获得执行机会"
+            order = []
+
+            async def waiter(index):
+                assert await priority.acquire()
+                order.append(index)
+
+            tasks = [asyncio.create_task(waiter(i)) for i in range(3)]
+            await asyncio.sleep(0)
+            assert priority.waiting == 3, "应该有3个请求排队"
+            for _ in range(3):
+                priority.release()
+                await asyncio.sleep(0)
+                # 执行机会直接转交，并发数不变
+                assert priority.in_flight == 1, "转交时并发数不应变化"
+            priority.release()
+            await asyncio.gather(*tasks)
+            return order, priority.in_flight
+
+        order, in_flight = asyncio.run(fifo_handoff())
+        print(f"  获得顺序: {order}，结束后并发数: {in_flight}")
+        assert order == [0, 1, 2], "应该按排队顺序获得执行机会"
+        assert in_flight == 0, "全部释放后并发数应为0"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    try:
+        print("\n子测试: 排队已满或超时被拒绝")
+
+        async def shedding():
+            priority = PriorityClass("test", 1, 1, 0.1)
+            await priority.acquire()
+            queued = asyncio.create_task(priority.acquire())
+            await asyncio.sleep(0)
+            full = await priority.acquire()
+            timed_out = await queued
+            return full, timed_out, priority.shed, priority.waiting
+
+        full, timed_out, shed, waiting = asyncio.run(shedding())
+        print(f"  排队已满: {full}，超时: {timed_out}，拒绝数: {shed}，排队深度: {waiting}")
+        assert full is False, "排队已满时应该立即拒绝"
+        assert timed_out is False, "超过排队超时应该拒绝"
+        assert shed == 2 and waiting == 0, "拒绝数或排队深度不正确"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    try:
+        print("\n子测试: 取消的请求不占用执行机会")
+
+        async def cancellation():
+            priority = PriorityClass("test", 1, 8, 1.0)
+            await priority.acquire()
+
+            # 排队中被取消
+            waiting = asyncio.create_task(priority.acquire())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            assert priority.waiting == 0, "取消的请求应该离开队列"
+
+            # 执行机会已转交但尚未恢复执行时被取消
+            handed = asyncio.create_task(priority.acquire())
+            await asyncio.sleep(0)
+            priority.release()
+            handed.cancel()
+            result = await asyncio.gather(handed, return_exceptions=True)
+            if result[0] is True:
+                priority.release()
+            return priority.in_flight, priority.waiting
+
+        in_flight, waiting = asyncio.run(cancellation())
+        print(f"  结束后并发数: {in_flight}，排队深度: {waiting}")
+        assert in_flight == 0 and waiting == 0, "取消后执行机会没有归还"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    try:
+        print("\n子测试: 过载时返回503和Retry-After")
+
+        async def overload():
+            scheduler = Scheduler()
+            scheduler.classes["hashing"] = PriorityClass("hashing", 1, 1, 0.1)
+            calls = []
+            middleware = PrioritySchedulingMiddleware(make_stub_app(calls, delay=0.3), scheduler)
+            responses = await asyncio.gather(*[
+                call_asgi(middleware, "POST", "/auth/login") for _ in range(3)
+            ])
+            return responses, len(calls), scheduler.classes["hashing"].stats()
+
+        responses, executed, stats = asyncio.run(overload())
+        statuses = sorted(status_code for status_code, _, _ in responses)
+        print(f"  状态码: {statuses}，执行次数: {executed}")
+        assert statuses == [200, 503, 503], "应该一个成功、两个被拒绝"
+        assert executed == 1, "被拒绝的请求不应该执行"
+        for status_code, headers, _ in responses:
+            if status_code == 503:
+                assert headers.get(b"retry-after") == b"1", "503 响应缺少 Retry-After"
+        assert stats["in_flight"] == 0 and stats["shed"] == 2, f"统计不正确: {stats}"
+        print("  ✅ 子测试通过")
+    except Exception as e:
+        print(f"  ❌ 子测试失败: {e}")
+        all_passed = False
+
+    return all_passed
+
 def main():
     """主测试函数"""
     print("🚀 开始详细的API功能测试...")
@@ -284,6 +581,9 @@ def main():
         tests.append(("受保护端点", False))
         tests.append(("管理员端点", False))
 
+    tests.append(("幂等键", test_idempotency()))
+    tests.append(("优先级调度", test_scheduling()))
+
     # 总结结果
     print_test_header("测试总结")
     passed = sum(1 for _, result in tests if result)